@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import yaml
+
+from prelabel import IMAGE_EXTS, hash_files, pool_threads, resolve_weights, run_pool, settings_hash
+from train_cache import read_yolo_labels
+
+# Evaluation harness. Inference runs once per (model, image) pair at a very
+# low confidence and the raw boxes are cached in .eval_cache/<model hash>.json,
+# keyed by image content hash. mAP, precision/recall at any confidence
+# threshold and latency are then recomputed from the cache, so threshold
+# sweeps and model/backend comparisons cost no extra inference.
+
+CACHE_DIR = ".eval_cache"
+EVAL_CONF = 0.001  # Keep (almost) everything, thresholds are applied afterwards
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+DEFAULT_THRESHOLDS = (0.25, 0.35, 0.40, 0.50)
+
+
+def load_ground_truth(split_dir):
+    """
+    Returns {image_path: labels (k, 5)} for a YOLO split (<split>/images + <split>/labels).
+    """
+    images_dir = os.path.join(split_dir, "images")
+    labels_dir = os.path.join(split_dir, "labels")
+    names = sorted(n for n in os.listdir(images_dir) if n.lower().endswith(IMAGE_EXTS))
+    return {
+        os.path.join(images_dir, n): read_yolo_labels(os.path.join(labels_dir, os.path.splitext(n)[0] + ".txt"))
+        for n in names
+    }
+
+
+def _cache_path(cache_dir, model_hash):
+    return os.path.join(cache_dir, f"{model_hash}.json")
+
+
+def load_cache(cache_dir, model_hash):
+    path = _cache_path(cache_dir, model_hash)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["images"]
+
+
+def save_cache(cache_dir, model_hash, model_path, images):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, model_hash)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"model": model_path, "images": images}, f)
+    os.replace(tmp, path)
+
+
+def cached_predictions(model_path, image_hashes, class_map, workers=2, batch_size=16, cache_dir=CACHE_DIR):
+    """
+    Returns {image_hash: {"boxes": [[cls, conf, x, y, w, h], ...], "latency_ms", "inference"}}
+    for every image, running inference only for images not cached yet.
+    Latency is the per-image share of a batched run, so "inference" records
+    the batch size, worker count and threads per worker it was measured with.
+    """
+    specs = [(resolve_weights(model_path), class_map)]
+    model_hash = settings_hash(specs, {}, EVAL_CONF)
+    images = load_cache(cache_dir, model_hash)
+
+    todo = [p for p, sha in image_hashes.items() if sha not in images]
+    print(f"{model_path}: {len(image_hashes) - len(todo)} cached, {len(todo)} to run")
+    if todo:
+        inference = {"batch": batch_size, "workers": workers, "threads": pool_threads(workers)}
+
+        def on_batch(predictions):
+            for pred in predictions:
+                images[image_hashes[pred["path"]]] = {
+                    "boxes": pred["boxes"],
+                    "latency_ms": pred["latency_ms"],
+                    "inference": inference,
+                }
+            save_cache(cache_dir, model_hash, model_path, images)
+
+        run_pool(todo, specs, EVAL_CONF, batch_size, workers, on_batch)
+    return images
+
+
+def xywh_to_xyxy(b):
+    return np.concatenate([b[:, :2] - b[:, 2:] / 2, b[:, :2] + b[:, 2:] / 2], axis=1)
+
+
+def box_iou(a, b):
+    """
+    IoU matrix (len(a), len(b)) for normalized xywh boxes.
+    """
+    a, b = xywh_to_xyxy(a), xywh_to_xyxy(b)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_image(preds, gt, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Greedy matching, highest confidence first. Returns a (n_pred, n_iou) bool
+    array telling whether each prediction is a true positive at each IoU.
+    """
+    tp = np.zeros((len(preds), len(iou_thresholds)), dtype=bool)
+    if len(preds) == 0 or len(gt) == 0:
+        return tp
+    iou = box_iou(preds[:, 2:6], gt[:, 1:5])
+    iou[preds[:, 0][:, None] != gt[:, 0][None, :]] = 0.0
+    order = np.argsort(-preds[:, 1], kind="stable")
+    for k, t in enumerate(iou_thresholds):
+        taken = np.zeros(len(gt), dtype=bool)
+        for i in order:
+            candidates = np.where((iou[i] >= t) & ~taken)[0]
+            if len(candidates):
+                j = candidates[np.argmax(iou[i, candidates])]
+                taken[j] = True
+                tp[i, k] = True
+    return tp
+
+
+def compute_ap(recall, precision):
+    """
+    Area under the precision envelope, sampled at 101 recall points (COCO style).
+    The (recall 1, precision 0) end point is only added when recall never
+    reaches 1, so a perfect detector scores 1.0. Ultralytics always adds it
+    and caps AP at 0.995, so `yolo val` can read up to 0.005 lower.
+    """
+    tail_rec, tail_pre = ([1.0], [0.0]) if recall[-1] < 1.0 else ([], [])
+    mrec = np.concatenate(([0.0], recall, tail_rec))
+    mpre = np.concatenate(([1.0], precision, tail_pre))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x)))
+
+
+def compute_metrics(predictions, ground_truth, image_hashes, nc, conf_thresholds=DEFAULT_THRESHOLDS):
+    """
+    Computes mAP50, mAP50-95, precision/recall/F1 per confidence threshold
+    (at IoU 0.5) and latency stats from cached predictions. Latency stats list
+    every distinct batch/workers/threads setting the cached numbers come from.
+    """
+    tps, confs, classes, latencies = [], [], [], []
+    settings = []
+    n_gt = np.zeros(nc, dtype=np.int64)
+    for path, gt in ground_truth.items():
+        pred = predictions.get(image_hashes[path], {"boxes": [], "latency_ms": None})
+        boxes = np.array(pred["boxes"], dtype=np.float64).reshape(-1, 6)
+        boxes = boxes[boxes[:, 0] < nc]
+        tps.append(match_image(boxes, gt))
+        confs.append(boxes[:, 1])
+        classes.append(boxes[:, 0].astype(np.int64))
+        n_gt += np.bincount(gt[:, 0].astype(np.int64), minlength=nc)[:nc]
+        if pred["latency_ms"] is not None:
+            latencies.append(pred["latency_ms"])
+            # Caches written before settings were recorded have no "inference"
+            inference = pred.get("inference")
+            if inference not in settings:
+                settings.append(inference)
+
+    tp = np.concatenate(tps) if tps else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    conf = np.concatenate(confs) if confs else np.zeros(0)
+    cls = np.concatenate(classes) if classes else np.zeros(0, dtype=np.int64)
+
+    ap = np.zeros((nc, len(IOU_THRESHOLDS)))
+    for c in range(nc):
+        m = cls == c
+        if n_gt[c] == 0 or not m.any():
+            continue
+        order = np.argsort(-conf[m], kind="stable")
+        tpc = tp[m][order]
+        ctp = np.cumsum(tpc, axis=0)
+        cfp = np.cumsum(~tpc, axis=0)
+        recall = ctp / n_gt[c]
+        precision = ctp / (ctp + cfp)
+        for k in range(len(IOU_THRESHOLDS)):
+            ap[c, k] = compute_ap(recall[:, k], precision[:, k])
+
+    present = n_gt > 0
+    total_gt = int(n_gt.sum())
+    by_threshold = []
+    for t in conf_thresholds:
+        m = conf >= t
+        n_pred = int(m.sum())
+        n_tp = int(tp[m, 0].sum())
+        p = n_tp / n_pred if n_pred else 0.0
+        r = n_tp / total_gt if total_gt else 0.0
+        f1 = 2 * p * r / (p + r) if p + r else 0.0
+        by_threshold.append({"conf": t, "precision": p, "recall": r, "f1": f1, "predictions": n_pred})
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "images": len(ground_truth),
+        "instances": total_gt,
+        "map50": float(ap[present, 0].mean()) if present.any() else 0.0,
+        "map50_95": float(ap[present].mean()) if present.any() else 0.0,
+        "ap50_per_class": ap[:, 0].tolist(),
+        "thresholds": by_threshold,
+        "latency_ms": {
+            "mean": float(lat.mean()),
+            "p50": float(np.percentile(lat, 50)),
+            "p95": float(np.percentile(lat, 95)),
+            "settings": settings,
+        },
+    }
+
+
+def print_report(model_path, metrics, names):
+    lat = metrics["latency_ms"]
+    print(f"\n=== {model_path} ===")
+    print(f"Images: {metrics['images']} | Instances: {metrics['instances']}")
+    print(f"mAP50: {metrics['map50']:.3f} | mAP50-95: {metrics['map50_95']:.3f}")
+    for name, ap50 in zip(names, metrics["ap50_per_class"]):
+        print(f"  AP50 {name}: {ap50:.3f}")
+    print("  conf   precision  recall  f1     preds")
+    for row in metrics["thresholds"]:
+        print(f"  {row['conf']:.2f}   {row['precision']:.3f}      {row['recall']:.3f}   {row['f1']:.3f}  {row['predictions']}")
+    print(f"Latency/image: mean {lat['mean']:.1f} ms | p50 {lat['p50']:.1f} ms | p95 {lat['p95']:.1f} ms")
+    for s in lat["settings"]:
+        if s is None:
+            print("  measured with unknown batch/workers (old cache, delete it to re-measure)")
+        else:
+            print(f"  measured at batch {s['batch']}, {s['workers']} worker(s) x {s['threads']} thread(s)")
+    if len(lat["settings"]) > 1:
+        print("  WARNING: latency mixes several settings, not comparable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate and compare checkpoints on a labeled split")
+    parser.add_argument("--model", nargs="+", default=["models/best.pt"], help="One or more checkpoints (.pt/.onnx/...)")
+    parser.add_argument("--dataset", default="data/labeled/85-train-15-validate-0-test", help="YOLO dataset directory (with data.yaml)")
+    parser.add_argument("--split", default="valid", help="Split to evaluate")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS), help="Confidence thresholds for precision/recall")
+    parser.add_argument("--workers", type=int, default=2, help="Inference processes")
+    parser.add_argument("--batch", type=int, default=16, help="Images per inference batch")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Prediction cache directory")
+    parser.add_argument("--json", help="Also write all metrics to this JSON file")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.dataset, "data.yaml"), "r", encoding="utf-8") as f:
+        names = yaml.safe_load(f)["names"]
+    split_dir = os.path.join(args.dataset, args.split)
+    if not os.path.isdir(split_dir):
+        print(f"No split folder {split_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    ground_truth = load_ground_truth(split_dir)
+    image_hashes = hash_files(list(ground_truth))
+    # Model classes are matched to dataset classes by name, so a COCO model's
+    # "bus" lines up with our "Bus"
+    class_map = {name.lower(): i for i, name in enumerate(names)}
+
+    report = {}
+    for model_path in args.model:
+        predictions = cached_predictions(model_path, image_hashes, class_map, args.workers, args.batch, args.cache_dir)
+        start = time.time()
+        metrics = compute_metrics(predictions, ground_truth, image_hashes, len(names), args.thresholds)
+        print_report(model_path, metrics, names)
+        print(f"(metrics computed in {(time.time() - start) * 1000:.0f} ms)")
+        report[model_path] = metrics
+
+    # Latency is only comparable between checkpoints measured the same way
+    settings = {json.dumps(m["latency_ms"]["settings"], sort_keys=True) for m in report.values()}
+    if len(settings) > 1:
+        print("\nWARNING: latencies above were measured with different batch/workers/threads. "
+              f"Delete their files in {args.cache_dir} and rerun with one --batch/--workers to compare them.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import sys
+import tarfile
+import time
+from datetime import datetime
+
+# Sharded frame archive.
+#
+#   data/archive/
+#       index.jsonl          <- one JSON record per frame (append-only)
+#       shard-000000.tar     <- plain (uncompressed) tar, JPEG bytes as members
+#       shard-000001.tar
+#
+# Every index record knows the shard, the byte offset and size of the JPEG
+# inside that shard, so random reads are a single mmap slice and nobody has
+# to walk the tar headers again.
+
+INDEX_NAME = "index.jsonl"
+SHARD_PATTERN = "shard-{:06d}.tar"
+DEFAULT_SHARD_SIZE = 512 * 1024 * 1024  # ~3000 Full-HD frames per shard
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Hashes a file in chunks so big files never have to fit in memory.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _padded(size):
+    # Tar pads member data up to the next 512 byte block
+    return (size + BLOCK_SIZE - 1) // BLOCK_SIZE * BLOCK_SIZE
+
+
+def load_index(root):
+    """
+    Reads index.jsonl. A half-written last line (crash mid-append) is ignored.
+    """
+    path = os.path.join(root, INDEX_NAME)
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping corrupt index line in {path}", file=sys.stderr)
+    return records
+
+
+def _drop_partial_line(path):
+    """
+    Cuts a half-written last index line (crash mid-append), so the next
+    record starts on a line of its own.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class FrameArchiveWriter:
+    """
+    Append-only writer. Frames go into the newest shard until it grows past
+    `shard_size`, then a fresh shard is started. Reopening an existing archive
+    continues where the last run stopped.
+    """
+
+    def __init__(self, root, shard_size=DEFAULT_SHARD_SIZE):
+        self.root = root
+        self.shard_size = shard_size
+        os.makedirs(root, exist_ok=True)
+
+        records = load_index(root)
+        self.count = len(records)
+        self._keys = {r["key"] for r in records}
+        self._shard_id = 0
+        if records:
+            self._shard_id = max(int(r["shard"][6:12]) for r in records)
+        # Where the last indexed frame of the current shard ends; everything
+        # after it is either tar end blocks or leftovers of an unclean exit
+        shard_end = max((r["offset"] + _padded(r["size"]) for r in records
+                         if r["shard"] == self._shard_name()), default=0)
+
+        self._tar = None
+        index_path = os.path.join(root, INDEX_NAME)
+        _drop_partial_line(index_path)
+        self._index = open(index_path, "a", encoding="utf-8")
+        self._open_shard(resume_at=shard_end)
+
+    def _shard_name(self):
+        return SHARD_PATTERN.format(self._shard_id)
+
+    def _open_shard(self, resume_at=0):
+        path = os.path.join(self.root, self._shard_name())
+        if os.path.exists(path):
+            # Resume from the index, not from the tar: a writer killed without
+            # close() leaves no end-of-archive blocks (and maybe half a member),
+            # which tarfile refuses to append to. Cut back to the last indexed
+            # frame and write fresh end blocks.
+            with open(path, "r+b") as f:
+                f.truncate(resume_at)
+                f.seek(resume_at)
+                f.write(b"\0" * (2 * BLOCK_SIZE))
+        # "a" creates the tar if missing, otherwise seeks past the last member
+        self._tar = tarfile.open(path, "a", format=tarfile.PAX_FORMAT)
+
+    def _roll_if_full(self):
+        if self._tar.offset >= self.shard_size:
+            self._tar.close()
+            self._shard_id += 1
+            self._open_shard()
+
+    def append(self, key, data, timestamp=None, source=""):
+        """
+        Stores `data` (encoded JPEG bytes) under `key` and returns the index record.
+        """
+        if key in self._keys:
+            raise ValueError(f"Key already in archive: {key}")
+        self._roll_if_full()
+
+        if timestamp is None:
+            timestamp = datetime.now()
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat(timespec="seconds")
+
+        info = tarfile.TarInfo(name=key)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        # After addfile the tar offset sits right after the padded data block
+        offset = self._tar.offset - _padded(len(data))
+        self._tar.fileobj.flush()
+
+        record = {
+            "key": key,
+            "shard": self._shard_name(),
+            "offset": offset,
+            "size": len(data),
+            "timestamp": timestamp,
+            "source": source,
+            "sha256": sha256_bytes(data),
+        }
+        # Index line is written only after the bytes are on disk, so every
+        # indexed record is always readable
+        self._index.write(json.dumps(record) + "\n")
+        self._index.flush()
+
+        self._keys.add(key)
+        self.count += 1
+        return record
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if not self._index.closed:
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameArchiveReader:
+    """
+    Random access through memory-mapped shards, sequential streaming through
+    plain buffered reads (one pass per shard, in offset order).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.records = load_index(root)
+        self._by_key = {r["key"]: i for i, r in enumerate(self.records)}
+        self._files = {}
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key):
+        return key in self._by_key
+
+    def keys(self):
+        return [r["key"] for r in self.records]
+
+    def _map(self, shard, end):
+        mm = self._maps.get(shard)
+        if mm is None or len(mm) < end:
+            # Shard grew since we mapped it (writer still appending) -> remap
+            if mm is not None:
+                mm.close()
+            f = self._files.get(shard)
+            if f is None:
+                f = open(os.path.join(self.root, shard), "rb")
+                self._files[shard] = f
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[shard] = mm
+        return mm
+
+    def record(self, item):
+        if isinstance(item, str):
+            return self.records[self._by_key[item]]
+        return self.records[item]
+
+    def read(self, item):
+        """
+        Returns the JPEG bytes for an index position or a key.
+        """
+        r = self.record(item)
+        mm = self._map(r["shard"], r["offset"] + r["size"])
+        return mm[r["offset"]:r["offset"] + r["size"]]
+
+    def __getitem__(self, item):
+        return self.read(item)
+
+    def stream(self, source=None):
+        """
+        Yields (record, bytes) for every frame, shard by shard.
+        """
+        by_shard = {}
+        for r in self.records:
+            if source is not None and r["source"] != source:
+                continue
+            by_shard.setdefault(r["shard"], []).append(r)
+
+        for shard in sorted(by_shard):
+            with open(os.path.join(self.root, shard), "rb") as f:
+                for r in sorted(by_shard[shard], key=lambda r: r["offset"]):
+                    f.seek(r["offset"])
+                    yield r, f.read(r["size"])
+
+    def __iter__(self):
+        return self.stream()
+
+    def close(self):
+        for mm in self._maps.values():
+            mm.close()
+        for f in self._files.values():
+            f.close()
+        self._maps = {}
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pack_directory(input_dir, archive_dir, shard_size=DEFAULT_SHARD_SIZE, source="raw"):
+    """
+    Copies loose JPEGs (e.g. data/raw) into an archive. Files already in the
+    archive are skipped, so it is safe to rerun. The loose files are left alone.
+    """
+    names = sorted(n for n in os.listdir(input_dir) if n.lower().endswith((".jpg", ".jpeg")))
+    added = 0
+    with FrameArchiveWriter(archive_dir, shard_size=shard_size) as writer:
+        for name in names:
+            if name in writer:
+                continue
+            path = os.path.join(input_dir, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            ts = datetime.fromtimestamp(os.path.getmtime(path))
+            writer.append(name, data, timestamp=ts, source=source)
+            added += 1
+    print(f"Packed {added} new frames into {archive_dir} ({len(names) - added} already there)")
+    return added
+
+
+def export_yolo(archive_dir, output_dir, labels_dir=None, source=None):
+    """
+    Writes the archive back out in the YOLO folder layout used in data/labeled/:
+
+        output_dir/images/<key>.jpg
+        output_dir/labels/<key>.txt   (only when a matching label exists)
+    """
+    images_dir = os.path.join(output_dir, "images")
+    out_labels_dir = os.path.join(output_dir, "labels")
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(out_labels_dir, exist_ok=True)
+
+    exported = 0
+    labeled = 0
+    with FrameArchiveReader(archive_dir) as reader:
+        for record, data in reader.stream(source=source):
+            with open(os.path.join(images_dir, record["key"]), "wb") as f:
+                f.write(data)
+            exported += 1
+
+            if labels_dir:
+                label_name = os.path.splitext(record["key"])[0] + ".txt"
+                label_path = os.path.join(labels_dir, label_name)
+                if os.path.exists(label_path):
+                    with open(label_path, "rb") as src, open(os.path.join(out_labels_dir, label_name), "wb") as dst:
+                        dst.write(src.read())
+                    labeled += 1
+
+    print(f"Exported {exported} frames ({labeled} with labels) to {output_dir}")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Torikamera frame archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_pack = sub.add_parser("pack", help="Copy loose JPEGs into an archive")
+    p_pack.add_argument("input", help="Directory with JPEGs (e.g. data/raw)")
+    p_pack.add_argument("archive", help="Archive directory (e.g. data/archive)")
+    p_pack.add_argument("--shard-mb", type=int, default=DEFAULT_SHARD_SIZE // (1024 * 1024), help="Shard size in MB")
+
+    p_export = sub.add_parser("export", help="Export archive to YOLO images/labels folders")
+    p_export.add_argument("archive", help="Archive directory")
+    p_export.add_argument("output", help="Output directory")
+    p_export.add_argument("--labels", help="Directory with YOLO .txt labels to copy alongside")
+    p_export.add_argument("--source", help="Only export frames from this source (live/history/raw)")
+
+    p_info = sub.add_parser("info", help="Print archive summary")
+    p_info.add_argument("archive", help="Archive directory")
+
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        pack_directory(args.input, args.archive, shard_size=args.shard_mb * 1024 * 1024)
+    elif args.command == "export":
+        export_yolo(args.archive, args.output, labels_dir=args.labels, source=args.source)
+    elif args.command == "info":
+        records = load_index(args.archive)
+        shards = sorted({r["shard"] for r in records})
+        total = sum(r["size"] for r in records)
+        sources = {}
+        for r in records:
+            sources[r["source"]] = sources.get(r["source"], 0) + 1
+        print(f"Frames: {len(records)} | Shards: {len(shards)} | Size: {total / (1024 * 1024):.1f} MB")
+        for source, count in sorted(sources.items()):
+            print(f"  {source or '-'}: {count}")
+        if records:
+            print(f"First: {records[0]['timestamp']}  Last: {records[-1]['timestamp']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
 import argparse
-import cv2
 import time
 import os
-import yt_dlp
 import sys
 import subprocess
 from datetime import datetime, timedelta
 
-import requests
 import re
 from urllib.parse import urljoin
 
+from frame_archive import FrameArchiveWriter
+
 def get_dynamic_youtube_url(base_url="https://torilive.fi"):
     """
     Scrapes torilive.fi to find the current embedded YouTube URL.
@@ -18,6 +17,10 @@ def get_dynamic_youtube_url(base_url="https://torilive.fi"):
     2. Finds the 'app.*.js' script.
     3. Fetches the JS and regex searches for the YouTube embed URL.
     """
+    # Heavy imports live inside the functions that need them, so a mode
+    # that never touches the network/browser doesn't pay for them at startup
+    import requests
+
     try:
         print(f"Scraping {base_url} for YouTube ID...")
         # 1. Fetch Request
@@ -66,6 +69,8 @@ def get_stream_url(url):
     If the input is 'https://torilive.fi/', it attempts to scrape the real YouTube URL first.
     Then uses yt-dlp to get the HLS stream.
     """
+    import yt_dlp
+
     # If it's the base site, try to scrape the dynamic ID
     if "torilive.fi" in url:
         scraped_url = get_dynamic_youtube_url(url)
@@ -87,19 +92,126 @@ def get_stream_url(url):
         return None, url
 
 
-def extract_frames_live(stream_url, limit, interval, output_dir):
+class AdaptiveSampler:
+    """
+    Decides which live frames are worth saving. Each candidate is shrunk to a
+    tiny grayscale thumbnail and compared with the thumbnail of the last saved
+    frame; only frames that changed enough are kept. Rate limits:
+    - never save more often than `min_interval` seconds,
+    - always save after `max_interval` seconds, even if nothing moved.
+    Optional quality gates skip dark (night) or blurry frames.
+    """
+
+    def __init__(self, min_interval=1.0, max_interval=300.0, change_threshold=6.0,
+                 min_brightness=None, min_sharpness=None, thumb_size=(64, 36)):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.min_brightness = min_brightness
+        self.min_sharpness = min_sharpness
+        self.thumb_size = thumb_size
+        self.last_thumb = None
+        self.last_save_time = None
+        self._candidate = None
+
+    def thumbnail(self, frame):
+        import cv2
+        # Resize first, then convert: the colour conversion runs on ~2k pixels instead of 2M
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def sharpness(self, frame):
+        import cv2
+        # Laplacian variance needs some detail left, so use a 320px-wide copy, not the thumbnail
+        h, w = frame.shape[:2]
+        gray = cv2.cvtColor(cv2.resize(frame, (320, max(1, h * 320 // w)), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    def score(self, thumb):
+        """
+        Mean absolute pixel difference (0-255) against the last saved frame.
+        """
+        if self.last_thumb is None:
+            return float("inf")
+        import cv2
+        return float(cv2.absdiff(thumb, self.last_thumb).mean())
+
+    def check(self, frame, now):
+        """
+        Returns (save, reason). Call saved() after the frame was actually written.
+        """
+        since_last = None if self.last_save_time is None else now - self.last_save_time
+        if since_last is not None and since_last < self.min_interval:
+            return False, "rate limit"
+
+        thumb = self.thumbnail(frame)
+        if self.min_brightness is not None and thumb.mean() < self.min_brightness:
+            return False, f"too dark ({thumb.mean():.0f})"
+        if self.min_sharpness is not None:
+            sharpness = self.sharpness(frame)
+            if sharpness < self.min_sharpness:
+                return False, f"too blurry ({sharpness:.0f})"
+
+        change = self.score(thumb)
+        self._candidate = thumb
+        if change >= self.change_threshold:
+            return True, f"change {change:.1f}"
+        if since_last is not None and since_last >= self.max_interval:
+            return True, f"max interval (change {change:.1f})"
+        return False, f"no change ({change:.1f})"
+
+    def saved(self, now):
+        self.last_thumb = self._candidate
+        self.last_save_time = now
+
+
+def add_adaptive_args(parser):
+    parser.add_argument("--adaptive", action="store_true", help="Live mode: save on scene change instead of a fixed interval")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="Adaptive: minimum seconds between saves")
+    parser.add_argument("--max-interval", type=float, default=300.0, help="Adaptive: save at least this often (seconds)")
+    parser.add_argument("--change-threshold", type=float, default=6.0, help="Adaptive: mean pixel difference (0-255) needed to save")
+    parser.add_argument("--min-brightness", type=float, help="Adaptive: skip frames darker than this (0-255)")
+    parser.add_argument("--min-sharpness", type=float, help="Adaptive: skip frames with Laplacian variance below this")
+
+
+def sampler_from_args(args):
+    if not args.adaptive:
+        return None
+    return AdaptiveSampler(
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        change_threshold=args.change_threshold,
+        min_brightness=args.min_brightness,
+        min_sharpness=args.min_sharpness,
+    )
+
+
+def extract_frames_live(stream_url, limit, interval, output_dir, archive=None, sampler=None):
     """
     Captures frames from the LIVE stream at the specified interval.
+    If `archive` (a FrameArchiveWriter) is given, frames go into the archive
+    instead of loose JPEGs in output_dir.
+    If `sampler` (an AdaptiveSampler) is given, it decides which frames to
+    save and `interval` is ignored.
     """
+    import cv2
+
     cap = cv2.VideoCapture(stream_url)
     if not cap.isOpened():
         print("Error: Could not open video stream.", file=sys.stderr)
         return
 
+    if archive is None:
+        os.makedirs(output_dir, exist_ok=True)
+
     frames_saved = 0
     last_capture_time = 0
     
-    print(f"Starting LIVE capture. Target: {limit} frames. Interval: {interval}s.")
+    if sampler is not None:
+        print(f"Starting ADAPTIVE LIVE capture. Target: {limit} frames. "
+              f"Interval: {sampler.min_interval}-{sampler.max_interval}s, change >= {sampler.change_threshold}.")
+    else:
+        print(f"Starting LIVE capture. Target: {limit} frames. Interval: {interval}s.")
     
     try:
         while frames_saved < limit:
@@ -109,20 +221,39 @@ def extract_frames_live(stream_url, limit, interval, output_dir):
                 break
 
             current_time = time.time()
-            if current_time - last_capture_time >= interval:
+            if sampler is not None:
+                save, reason = sampler.check(frame, current_time)
+            else:
+                save, reason = current_time - last_capture_time >= interval, None
+            if save:
                 # Sanity check: Ensure frame has content (not empty/black)
                 if frame.size == 0 or cv2.countNonZero(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)) == 0:
                     print("Skipping empty/black frame.")
                     continue
 
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                now = datetime.now()
+                timestamp = now.strftime("%Y%m%d_%H%M%S")
                 filename = os.path.join(output_dir, f"torikamera_{timestamp}_live.jpg")
+                # Names have second resolution; a fast adaptive burst gets _1, _2, ... suffixes
+                suffix = 0
+                while (os.path.basename(filename) in archive) if archive is not None else os.path.exists(filename):
+                    suffix += 1
+                    filename = os.path.join(output_dir, f"torikamera_{timestamp}_live_{suffix}.jpg")
                 
-                cv2.imwrite(filename, frame)
-                print(f"Saved {filename} ({frames_saved + 1}/{limit})")
+                if archive is not None:
+                    ok, buf = cv2.imencode(".jpg", frame)
+                    if not ok:
+                        print("Skipping frame that failed to encode.")
+                        continue
+                    archive.append(os.path.basename(filename), buf.tobytes(), timestamp=now, source="live")
+                else:
+                    cv2.imwrite(filename, frame)
+                print(f"Saved {filename} ({frames_saved + 1}/{limit})" + (f" [{reason}]" if reason else ""))
                 
                 frames_saved += 1
                 last_capture_time = current_time
+                if sampler is not None:
+                    sampler.saved(current_time)
             
     except KeyboardInterrupt:
         print("\nStopping capture...")
@@ -130,13 +261,14 @@ def extract_frames_live(stream_url, limit, interval, output_dir):
         cap.release()
         print(f"Done. Saved {frames_saved} frames to {output_dir}")
 
-from playwright.sync_api import sync_playwright
-
-def extract_frames_history(youtube_url, history_hours, limit, duration, output_dir):
+def extract_frames_history(youtube_url, history_hours, limit, duration, output_dir, archive=None):
     """
     Uses Playwright to capture frames from the YouTube player by seeking.
     This bypasses API restrictions by acting as a real user.
+    If `archive` (a FrameArchiveWriter) is given, frames go into the archive.
     """
+    from playwright.sync_api import sync_playwright
+
     print(f"Starting HISTORY capture via Browser. Offsets: {history_hours} hours ago.")
     
     with sync_playwright() as p:
@@ -373,7 +505,11 @@ def extract_frames_history(youtube_url, history_hours, limit, duration, output_d
                 filename = os.path.join(output_dir, f"torikamera_{timestamp_str}_h{int(hours_ago)}h_f{i}.jpg")
                 
                 # Screenshot ONLY the video element to avoid any page borders
-                page.locator("video").screenshot(path=filename)
+                if archive is not None:
+                    data = page.locator("video").screenshot(type="jpeg")
+                    archive.append(os.path.basename(filename), data, timestamp=past_time, source="history")
+                else:
+                    page.locator("video").screenshot(path=filename)
                 
                 print(f"Saved {filename}")
                 
@@ -391,6 +527,8 @@ def main():
     parser.add_argument("--limit", type=int, default=5, help="Number of frames to capture") # Default lowered for browser
     parser.add_argument("--interval", type=int, default=5, help="Seconds between captures (Live mode)")
     parser.add_argument("--output", default="data/raw", help="Directory to save frames")
+    parser.add_argument("--archive", help="Append frames to a sharded archive directory (e.g. data/archive) instead of loose JPEGs")
+    add_adaptive_args(parser)
     
     # Time Travel Arguments
     parser.add_argument("--history", type=float, nargs='+', help="List of hour offsets to scrape from past (e.g. 0.5 2 12)")
@@ -406,12 +544,17 @@ def main():
     if not youtube_url:
         sys.exit(1)
 
-    if args.history:
-        # History Mode (Browser)
-        extract_frames_history(youtube_url, args.history, args.limit, args.duration, args.output)
-    else:
-        # Live Mode (CV2)
-        extract_frames_live(stream_url, args.limit, args.interval, args.output)
+    archive = FrameArchiveWriter(args.archive) if args.archive else None
+    try:
+        if args.history:
+            # History Mode (Browser)
+            extract_frames_history(youtube_url, args.history, args.limit, args.duration, args.output, archive=archive)
+        else:
+            # Live Mode (CV2)
+            extract_frames_live(stream_url, args.limit, args.interval, args.output, archive=archive, sampler=sampler_from_args(args))
+    finally:
+        if archive is not None:
+            archive.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,338 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from frame_archive import file_sha256
+from thresholds import BUS_CONF, PERSON_CONF
+
+# Pre-labeling: runs the detectors over a folder of frames and writes YOLO
+# .txt files next to the images, so labeling starts from a draft instead of
+# from zero.
+#
+# <dir>/prelabel_manifest.json remembers, per image, the content hash and the
+# hash of the models + settings that produced its label. Reruns skip every
+# image whose entry still matches.
+
+MANIFEST_NAME = "prelabel_manifest.json"
+RANKING_NAME = "prelabel_ranking.txt"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# Per-process model cache, filled by _init_worker()
+_models = []
+
+
+def _init_worker(specs, threads):
+    """
+    Loads the models once per worker process. `specs` is a list of
+    (model_path, class_map) where class_map maps a model class name
+    (lowercase) to the output class id, or is None to keep ids as-is.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    # N processes x all cores each would just thrash the CPU
+    torch.set_num_threads(threads)
+    for path, class_map in specs:
+        _models.append((YOLO(path), class_map))
+
+
+def _predict_batch(paths, conf):
+    """
+    Runs every loaded model on a batch of image paths. Returns one dict per
+    image: {"path", "boxes": [[cls, conf, x, y, w, h], ...], "latency_ms"}.
+    Box coordinates are normalized YOLO xywh.
+    """
+    out = [{"path": p, "boxes": [], "latency_ms": 0.0} for p in paths]
+    for model, class_map in _models:
+        results = model(paths, conf=conf, verbose=False)
+        for item, r in zip(out, results):
+            item["latency_ms"] += sum(v for v in r.speed.values() if v)
+            for cls, c, xywhn in zip(r.boxes.cls.tolist(), r.boxes.conf.tolist(), r.boxes.xywhn.tolist()):
+                if class_map is None:
+                    out_cls = int(cls)
+                else:
+                    out_cls = class_map.get(model.names[int(cls)].lower())
+                    if out_cls is None:
+                        continue
+                item["boxes"].append([out_cls, round(c, 4)] + [round(v, 6) for v in xywhn])
+    return out
+
+
+def pool_threads(workers):
+    """
+    Torch threads per worker process: the cores split evenly between workers.
+    """
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def run_pool(paths, specs, conf, batch_size, workers, on_batch):
+    """
+    Splits `paths` into batches and runs them on a process pool.
+    `on_batch(predictions)` is called in this process as batches finish.
+    """
+    threads = pool_threads(workers)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs, threads)) as pool:
+        futures = [pool.submit(_predict_batch, batch, conf) for batch in batches]
+        for future in as_completed(futures):
+            on_batch(future.result())
+
+
+def hash_files(paths, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(file_sha256, paths)))
+
+
+def box_uncertainty(conf):
+    # 1.0 at conf 0.5 (model can't decide), 0.0 at conf 0 or 1
+    return 1.0 - abs(2.0 * conf - 1.0)
+
+
+def frame_uncertainty(boxes):
+    """
+    Score used to rank frames for labeling: the most uncertain single box.
+    Frames with no detections at all score 0.
+    """
+    return max((box_uncertainty(b[1]) for b in boxes), default=0.0)
+
+
+def resolve_weights(path):
+    """
+    Returns a local path for model weights. Bare official names like
+    yolov8n.pt are downloaded by ultralytics if missing, same as YOLO(path)
+    would do, so they can be hashed before any model is loaded. Paths with a
+    directory part (models/best.pt) are never looked up online.
+    """
+    if os.path.exists(path):
+        return path
+    message = f"Model weights not found: {path} (pass a local .pt file or an official ultralytics model name)"
+    if os.path.dirname(path):
+        raise FileNotFoundError(message)
+    try:
+        from ultralytics.utils.downloads import attempt_download_asset
+        local = str(attempt_download_asset(path))
+    except ImportError:
+        local = path
+    if not os.path.exists(local):
+        raise FileNotFoundError(message)
+    return local
+
+
+def weights_sha256(path):
+    """
+    Content hash of model weights. Export backends like *_openvino_model/
+    are directories: every file is hashed with its relative path, in sorted
+    order, so renames and edits both change the hash.
+    """
+    if not os.path.isdir(path):
+        return file_sha256(path)
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            h.update(os.path.relpath(full, path).replace(os.sep, "/").encode() + b"\0")
+            h.update(file_sha256(full).encode())
+    return h.hexdigest()
+
+
+def settings_hash(specs, label_confs, min_conf):
+    """
+    Hash of everything that decides the label output: model weights, class
+    mapping and thresholds. Changing any of them re-labels every frame.
+    """
+    key = {
+        "models": [[weights_sha256(path), class_map] for path, class_map in specs],
+        "label_confs": label_confs,
+        "min_conf": min_conf,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_class_names(data_yaml):
+    import yaml
+
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)["names"]
+
+
+def class_id(names, name, data_yaml):
+    """
+    Index of `name` (case-insensitive) in the dataset's class names. Labels
+    with an id outside data.yaml make ultralytics drop the whole image as
+    corrupt, so a missing class is an error rather than a guess.
+    """
+    lowered = [n.lower() for n in names]
+    if name not in lowered:
+        raise ValueError(f"Class '{name}' is not in {data_yaml} (names: {names}). "
+                         f"Add it to names and raise nc before pre-labeling {name} boxes.")
+    return lowered.index(name)
+
+
+def write_labels(label_path, boxes, label_confs):
+    """
+    Writes YOLO lines for the boxes that pass their class threshold. Returns the count.
+    """
+    lines = []
+    for cls, conf, x, y, w, h in boxes:
+        if conf >= label_confs.get(cls, 1.0):
+            lines.append(f"{cls} {x:.6f} {y:.6f} {w:.6f} {h:.6f}")
+    with open(label_path, "w") as f:
+        f.write("\n".join(lines) + ("\n" if lines else ""))
+    return len(lines)
+
+
+def prelabel(directory, bus_model="models/best.pt", person_model=None, batch_size=32, workers=2,
+             min_conf=0.10, bus_conf=BUS_CONF, person_conf=PERSON_CONF, overwrite=False, data_yaml=None):
+    """
+    Pre-labels every image in `directory` that is new or changed since the
+    last run. Class ids come from `data_yaml` (bus 0 / person 1 without it).
+    Returns the manifest.
+    """
+    names = load_class_names(data_yaml) if data_yaml else ["bus", "person"]
+    bus_id = class_id(names, "bus", data_yaml)
+    specs = [(resolve_weights(bus_model), {"bus": bus_id})]
+    label_confs = {bus_id: bus_conf}
+    if person_model:
+        person_id = class_id(names, "person", data_yaml)
+        specs.append((resolve_weights(person_model), {"person": person_id}))
+        label_confs[person_id] = person_conf
+
+    manifest = load_manifest(directory)
+    files = manifest["files"]
+    model_hash = settings_hash(specs, {str(k): v for k, v in label_confs.items()}, min_conf)
+
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTS))
+    paths = [os.path.join(directory, n) for n in names]
+    hashes = hash_files(paths)
+
+    # Forget frames deleted since the last run, so the ranking never points at them
+    present = set(names)
+    removed = [name for name in files if name not in present]
+    for name in removed:
+        del files[name]
+
+    todo = []
+    skipped_manual = 0
+    for name, path in zip(names, paths):
+        label_path = os.path.splitext(path)[0] + ".txt"
+        entry = files.get(name)
+        has_label = os.path.exists(label_path)
+        if entry and entry["sha256"] == hashes[path] and entry["model_hash"] == model_hash and has_label:
+            continue
+        if has_label and not overwrite and (not entry or file_sha256(label_path) != entry.get("label_sha256")):
+            # A label we did not write (or one edited since) -> hand-labeled, keep it
+            skipped_manual += 1
+            continue
+        todo.append(path)
+
+    print(f"Pre-labeling {len(todo)} of {len(names)} images in {directory} "
+          f"({len(names) - len(todo) - skipped_manual} up to date, {skipped_manual} hand-labeled)")
+    if not todo:
+        if removed:
+            save_manifest(directory, manifest)
+            write_ranking(directory, manifest)
+        return manifest
+
+    start = time.time()
+    done = 0
+
+    def on_batch(predictions):
+        nonlocal done
+        for pred in predictions:
+            path = pred["path"]
+            name = os.path.basename(path)
+            label_path = os.path.splitext(path)[0] + ".txt"
+            n = write_labels(label_path, pred["boxes"], label_confs)
+            files[name] = {
+                "sha256": hashes[path],
+                "model_hash": model_hash,
+                "label_sha256": file_sha256(label_path),
+                "boxes": n,
+                "uncertainty": round(frame_uncertainty(pred["boxes"]), 4),
+            }
+        done += len(predictions)
+        # Saved after every batch, so an interrupted run resumes from here
+        save_manifest(directory, manifest)
+        rate = done / max(time.time() - start, 1e-6)
+        print(f"  {done}/{len(todo)} images ({rate:.1f} img/s)")
+
+    run_pool(todo, specs, min_conf, batch_size, workers, on_batch)
+    write_ranking(directory, manifest)
+    return manifest
+
+
+def write_ranking(directory, manifest, top=20):
+    """
+    Writes all frames most-uncertain-first to prelabel_ranking.txt and prints the top.
+    """
+    ranked = sorted(manifest["files"].items(), key=lambda kv: (-kv[1]["uncertainty"], kv[0]))
+    with open(os.path.join(directory, RANKING_NAME), "w") as f:
+        for name, entry in ranked:
+            f.write(f"{entry['uncertainty']:.4f} {entry['boxes']} {name}\n")
+    print(f"Most uncertain frames (label these first), full list in {RANKING_NAME}:")
+    for name, entry in ranked[:top]:
+        print(f"  {entry['uncertainty']:.3f}  {name}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-label raw captures with the current models")
+    parser.add_argument("directory", nargs="?", default="data/raw", help="Folder with frames")
+    parser.add_argument("--data", default="data/labeled/85-train-15-validate-0-test/data.yaml",
+                        help="data.yaml the labels are for, class ids are looked up by name")
+    parser.add_argument("--model", default="models/best.pt", help="Bus model (written as the 'Bus' class)")
+    parser.add_argument("--person-model", help="Optional person model, e.g. yolov8n.pt (needs 'Person' in data.yaml)")
+    parser.add_argument("--batch", type=int, default=32, help="Images per inference batch")
+    parser.add_argument("--workers", type=int, default=2, help="Inference processes")
+    parser.add_argument("--min-conf", type=float, default=0.10, help="Lowest confidence kept for uncertainty ranking")
+    parser.add_argument("--bus-conf", type=float, default=BUS_CONF, help="Confidence needed to write a bus label")
+    parser.add_argument("--person-conf", type=float, default=PERSON_CONF, help="Confidence needed to write a person label")
+    parser.add_argument("--overwrite", action="store_true", help="Also overwrite label files not written by this tool")
+    parser.add_argument("--rank-only", action="store_true", help="Only print the ranking from the existing manifest")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"No such directory: {args.directory}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.rank_only:
+        write_ranking(args.directory, load_manifest(args.directory))
+        return
+
+    if not os.path.isfile(args.data):
+        print(f"No such data.yaml: {args.data}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        prelabel(args.directory, bus_model=args.model, person_model=args.person_model,
+                 batch_size=args.batch, workers=args.workers, min_conf=args.min_conf,
+                 bus_conf=args.bus_conf, person_conf=args.person_conf, overwrite=args.overwrite,
+                 data_yaml=args.data)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+import numpy as np
+import pytest
+import evaluate
+from evaluate import EVAL_CONF, box_iou, compute_ap, compute_metrics, match_image
+from prelabel import pool_threads, settings_hash
+
+# --- Unit Tests ---
+
+def test_box_iou():
+    a = np.array([[0.5, 0.5, 0.2, 0.2]])
+    b = np.array([[0.5, 0.5, 0.2, 0.2], [0.6, 0.5, 0.2, 0.2], [0.9, 0.9, 0.1, 0.1]])
+    iou = box_iou(a, b)
+    assert iou.shape == (1, 3)
+    assert iou[0, 0] == pytest.approx(1.0)
+    assert iou[0, 1] == pytest.approx(1 / 3)
+    assert iou[0, 2] == 0.0
+
+def test_match_image_one_prediction_per_ground_truth():
+    gt = np.array([[0, 0.5, 0.5, 0.2, 0.2]])
+    preds = np.array([
+        [0, 0.6, 0.5, 0.5, 0.2, 0.2],   # duplicate, lower conf -> FP
+        [0, 0.9, 0.5, 0.5, 0.2, 0.2],   # best -> TP
+    ])
+    tp = match_image(preds, gt)
+    assert tp[:, 0].tolist() == [False, True]
+
+def test_compute_ap_perfect_and_empty():
+    assert compute_ap(np.array([1.0]), np.array([1.0])) == pytest.approx(1.0)
+    assert compute_ap(np.array([0.0]), np.array([0.0])) == pytest.approx(0.0)
+    # Missing objects still cost AP, the end point is only dropped at full recall
+    assert compute_ap(np.array([0.5]), np.array([1.0])) < 1.0
+
+def test_compute_metrics_thresholds_from_cache():
+    gt = {
+        "a.jpg": np.array([[0, 0.5, 0.5, 0.2, 0.2]], dtype=np.float32),
+        "b.jpg": np.array([[0, 0.3, 0.3, 0.2, 0.2]], dtype=np.float32),
+    }
+    hashes = {"a.jpg": "ha", "b.jpg": "hb"}
+    predictions = {
+        "ha": {"boxes": [[0, 0.9, 0.5, 0.5, 0.2, 0.2]], "latency_ms": 10.0},
+        "hb": {"boxes": [[0, 0.38, 0.3, 0.3, 0.2, 0.2], [0, 0.5, 0.8, 0.8, 0.1, 0.1]], "latency_ms": 30.0},
+    }
+    m = compute_metrics(predictions, gt, hashes, nc=1, conf_thresholds=(0.35, 0.40))
+    at_035, at_040 = m["thresholds"]
+    # 0.35 keeps all three boxes (2 TP), 0.40 drops the 0.38 TP
+    assert at_035["recall"] == pytest.approx(1.0)
+    assert at_035["precision"] == pytest.approx(2 / 3)
+    assert at_040["recall"] == pytest.approx(0.5)
+    assert at_040["precision"] == pytest.approx(0.5)
+    assert 0.0 < m["map50"] <= 1.0
+    assert m["latency_ms"]["mean"] == pytest.approx(20.0)
+
+def test_directory_model_is_hashed_by_contents(tmp_path):
+    # Export backends (OpenVINO, NCNN, SavedModel) are directories
+    model = tmp_path / "x_openvino_model"
+    model.mkdir()
+    (model / "x.xml").write_text("graph")
+    (model / "x.bin").write_bytes(b"weights-v1")
+    before = settings_hash([(str(model), {"bus": 0})], {}, EVAL_CONF)
+    assert settings_hash([(str(model), {"bus": 0})], {}, EVAL_CONF) == before
+    (model / "x.bin").write_bytes(b"weights-v2")
+    changed = settings_hash([(str(model), {"bus": 0})], {}, EVAL_CONF)
+    assert changed != before
+    (model / "x.bin").rename(model / "y.bin")
+    assert settings_hash([(str(model), {"bus": 0})], {}, EVAL_CONF) != changed
+
+def test_cached_latency_records_inference_settings(tmp_path, capsys):
+    def fake_run_pool(paths, specs, conf, batch_size, workers, on_batch):
+        on_batch([{"path": p, "boxes": [], "latency_ms": 5.0} for p in paths])
+
+    model = tmp_path / "model.pt"
+    model.write_bytes(b"weights")
+    hashes = {"a.jpg": "ha"}
+    with patch.object(evaluate, "run_pool", fake_run_pool):
+        predictions = evaluate.cached_predictions(str(model), hashes, {"bus": 0}, workers=2, batch_size=4,
+                                                  cache_dir=str(tmp_path / "cache"))
+    assert predictions["ha"]["inference"] == {"batch": 4, "workers": 2, "threads": pool_threads(2)}
+
+    m = compute_metrics(predictions, {"a.jpg": np.zeros((0, 5))}, hashes, nc=1)
+    evaluate.print_report("model.pt", m, ["Bus"])
+    assert "measured at batch 4, 2 worker(s)" in capsys.readouterr().out
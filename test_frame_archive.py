@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import tarfile
+import pytest
+from frame_archive import (
+    FrameArchiveWriter,
+    FrameArchiveReader,
+    export_yolo,
+    load_index,
+    pack_directory,
+    sha256_bytes,
+)
+
+# --- Fixtures ---
+@pytest.fixture
+def archive_dir(tmp_path):
+    return str(tmp_path / "archive")
+
+def fake_jpeg(i, size=1000):
+    return bytes([i % 256]) * size
+
+# --- Unit Tests ---
+
+def test_append_and_random_read(archive_dir):
+    with FrameArchiveWriter(archive_dir) as writer:
+        for i in range(3):
+            writer.append(f"frame_{i}.jpg", fake_jpeg(i), source="live")
+
+    with FrameArchiveReader(archive_dir) as reader:
+        assert len(reader) == 3
+        assert reader.read(1) == fake_jpeg(1)
+        assert reader["frame_2.jpg"] == fake_jpeg(2)
+        record = reader.record("frame_0.jpg")
+        assert record["source"] == "live"
+        assert record["sha256"] == sha256_bytes(fake_jpeg(0))
+
+def test_shards_roll_over_and_stay_valid_tar(archive_dir):
+    with FrameArchiveWriter(archive_dir, shard_size=2500) as writer:
+        for i in range(6):
+            writer.append(f"frame_{i}.jpg", fake_jpeg(i))
+
+    shards = sorted({r["shard"] for r in load_index(archive_dir)})
+    assert len(shards) > 1
+    # Shards are plain tars, so standard tools can still open them
+    names = []
+    for shard in shards:
+        with tarfile.open(os.path.join(archive_dir, shard)) as tar:
+            names += tar.getnames()
+    assert names == [f"frame_{i}.jpg" for i in range(6)]
+
+def test_reopen_appends_to_existing_archive(archive_dir):
+    with FrameArchiveWriter(archive_dir) as writer:
+        writer.append("a.jpg", fake_jpeg(1))
+    with FrameArchiveWriter(archive_dir) as writer:
+        assert "a.jpg" in writer
+        with pytest.raises(ValueError):
+            writer.append("a.jpg", fake_jpeg(1))
+        writer.append("b.jpg", fake_jpeg(2))
+
+    with FrameArchiveReader(archive_dir) as reader:
+        assert reader.keys() == ["a.jpg", "b.jpg"]
+        assert reader["a.jpg"] == fake_jpeg(1)
+        assert reader["b.jpg"] == fake_jpeg(2)
+
+def test_reopen_after_unclean_exit(archive_dir):
+    # Writer killed without close(): no tar end blocks, like SIGKILL/power loss
+    code = (
+        "import os; from frame_archive import FrameArchiveWriter; "
+        f"w = FrameArchiveWriter({archive_dir!r}); "
+        "w.append('a.jpg', bytes([1]) * 1000); w.append('b.jpg', bytes([2]) * 1000); "
+        "os._exit(0)"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    # ...and some junk from a half-finished append after the last indexed frame
+    with open(os.path.join(archive_dir, "shard-000000.tar"), "ab") as f:
+        f.write(b"half a header")
+    with open(os.path.join(archive_dir, "index.jsonl"), "a") as f:
+        f.write('{"key": "c.jp')
+
+    with FrameArchiveWriter(archive_dir) as writer:
+        writer.append("c.jpg", fake_jpeg(3))
+
+    with FrameArchiveReader(archive_dir) as reader:
+        assert reader.keys() == ["a.jpg", "b.jpg", "c.jpg"]
+        assert reader["b.jpg"] == fake_jpeg(2)
+        assert reader["c.jpg"] == fake_jpeg(3)
+    with tarfile.open(os.path.join(archive_dir, "shard-000000.tar")) as tar:
+        assert tar.getnames() == ["a.jpg", "b.jpg", "c.jpg"]
+
+def test_stream_filters_by_source(archive_dir):
+    with FrameArchiveWriter(archive_dir) as writer:
+        writer.append("live.jpg", fake_jpeg(1), source="live")
+        writer.append("hist.jpg", fake_jpeg(2), source="history")
+
+    with FrameArchiveReader(archive_dir) as reader:
+        streamed = [(r["key"], data) for r, data in reader.stream(source="history")]
+    assert streamed == [("hist.jpg", fake_jpeg(2))]
+
+def test_pack_and_export_yolo_layout(tmp_path, archive_dir):
+    raw = tmp_path / "raw"
+    labels = tmp_path / "labels"
+    raw.mkdir()
+    labels.mkdir()
+    (raw / "f0.jpg").write_bytes(fake_jpeg(0))
+    (raw / "f1.jpg").write_bytes(fake_jpeg(1))
+    (labels / "f1.txt").write_text("0 0.5 0.5 0.1 0.1\n")
+
+    assert pack_directory(str(raw), archive_dir) == 2
+    # Rerun is a no-op
+    assert pack_directory(str(raw), archive_dir) == 0
+
+    out = tmp_path / "export"
+    export_yolo(archive_dir, str(out), labels_dir=str(labels))
+    assert sorted(os.listdir(out / "images")) == ["f0.jpg", "f1.jpg"]
+    assert os.listdir(out / "labels") == ["f1.txt"]
+    assert (out / "images" / "f1.jpg").read_bytes() == fake_jpeg(1)
@@ -4,7 +4,7 @@ import shutil
 from unittest.mock import MagicMock, patch
 import cv2
 import numpy as np
-from get_data import get_stream_url, extract_frames, get_dynamic_youtube_url
+from get_data import get_stream_url, extract_frames_live, get_dynamic_youtube_url
 
 # --- Fixtures ---
 @pytest.fixture
@@ -23,8 +23,9 @@ def test_get_stream_url_success():
         instance = mock_ydl.return_value.__enter__.return_value
         instance.extract_info.return_value = {'url': 'http://test.stream/playlist.m3u8'}
         
-        url = get_stream_url("http://fake.url")
-        assert url == 'http://test.stream/playlist.m3u8'
+        stream_url, youtube_url = get_stream_url("http://fake.url")
+        assert stream_url == 'http://test.stream/playlist.m3u8'
+        assert youtube_url == "http://fake.url"
 
 def test_get_stream_url_failure():
     with patch('yt_dlp.YoutubeDL') as mock_ydl:
@@ -34,8 +35,8 @@ def test_get_stream_url_failure():
         # Should return None if scraping fails AND direct yt-dlp fails
         # Mocking generic fail for this test
         with patch('get_data.get_dynamic_youtube_url', return_value=None):
-            url = get_stream_url("http://broken.url")
-            assert url is None
+            stream_url, _ = get_stream_url("http://broken.url")
+            assert stream_url is None
 
 def test_get_dynamic_youtube_url():
     # Mock requests to simulate torilive.fi structure
@@ -100,7 +101,7 @@ def test_extract_frames_logic(mock_imwrite, mock_capture, temp_output_dir):
         # Let's provide a sequence of increasing times enough to capture 2 frames.
         mock_time.side_effect = [0, 0, 5, 5, 10, 10, 15, 15, 20, 20] 
         
-        extract_frames("http://dummy.stream", limit=2, interval=5, output_dir=temp_output_dir)
+        extract_frames_live("http://dummy.stream", limit=2, interval=5, output_dir=temp_output_dir)
         
     # Verify outputs
     assert os.path.exists(temp_output_dir)
@@ -115,7 +116,89 @@ def test_extract_frames_stream_fail(mock_capture, temp_output_dir):
     mock_capture.return_value = mock_cap_instance
     mock_cap_instance.isOpened.return_value = False # Simulation: Stream won't open
     
-    extract_frames("http://bad.stream", limit=1, interval=1, output_dir=temp_output_dir)
+    extract_frames_live("http://bad.stream", limit=1, interval=1, output_dir=temp_output_dir)
     
     # Directory might be created, but no files
     assert not os.listdir(temp_output_dir) if os.path.exists(temp_output_dir) else True
+
+# --- Adaptive Sampling Tests ---
+
+from get_data import AdaptiveSampler
+
+def test_adaptive_sampler_skips_static_scene():
+    sampler = AdaptiveSampler(min_interval=1, max_interval=100, change_threshold=5)
+    empty = np.full((108, 192, 3), 80, dtype=np.uint8)
+
+    save, _ = sampler.check(empty, now=0)
+    assert save  # First frame is always new content
+    sampler.saved(0)
+
+    save, reason = sampler.check(empty, now=10)
+    assert not save
+    assert reason.startswith("no change")
+
+    busy = empty.copy()
+    busy[20:80, 40:150] = 255  # Bus drives in
+    save, _ = sampler.check(busy, now=11)
+    assert save
+
+def test_adaptive_sampler_rate_limits():
+    sampler = AdaptiveSampler(min_interval=2, max_interval=30, change_threshold=5)
+    frame = np.zeros((108, 192, 3), dtype=np.uint8)
+    sampler.check(frame, now=0)
+    sampler.saved(0)
+
+    changed = np.full((108, 192, 3), 200, dtype=np.uint8)
+    assert sampler.check(changed, now=1) == (False, "rate limit")
+    # Nothing changes, but max_interval forces a save
+    save, reason = sampler.check(frame, now=31)
+    assert save and reason.startswith("max interval")
+
+def test_adaptive_sampler_quality_gates():
+    sampler = AdaptiveSampler(min_brightness=30, min_sharpness=10)
+    dark = np.full((108, 192, 3), 5, dtype=np.uint8)
+    assert sampler.check(dark, now=0)[1].startswith("too dark")
+    flat = np.full((108, 192, 3), 120, dtype=np.uint8)
+    assert sampler.check(flat, now=0)[1].startswith("too blurry")
+
+@patch('cv2.VideoCapture')
+@patch('cv2.imwrite')
+def test_extract_frames_live_adaptive(mock_imwrite, mock_capture, temp_output_dir):
+    mock_cap_instance = MagicMock()
+    mock_capture.return_value = mock_cap_instance
+    mock_cap_instance.isOpened.return_value = True
+
+    static = np.full((108, 192, 3), 60, dtype=np.uint8)
+    changed = static.copy()
+    changed[10:90, 10:180] = 250
+    # Static frames after the first one are dropped, the changed one is kept
+    mock_cap_instance.read.side_effect = [(True, static), (True, static), (True, static), (True, changed)]
+
+    sampler = AdaptiveSampler(min_interval=1, max_interval=1000, change_threshold=5)
+    with patch('time.time', side_effect=[0, 5, 10, 15]), \
+         patch('get_data.datetime') as mock_dt:
+        mock_dt.now.side_effect = [MagicMock(strftime=MagicMock(return_value=f"20260101_00000{i}")) for i in range(2)]
+        extract_frames_live("http://dummy.stream", limit=2, interval=5, output_dir=temp_output_dir, sampler=sampler)
+
+    assert mock_imwrite.call_count == 2
+
+@patch('cv2.VideoCapture')
+def test_extract_frames_live_same_second_gets_unique_names(mock_capture, tmp_path):
+    mock_cap_instance = MagicMock()
+    mock_capture.return_value = mock_cap_instance
+    mock_cap_instance.isOpened.return_value = True
+    a = np.full((108, 192, 3), 60, dtype=np.uint8)
+    b = np.full((108, 192, 3), 200, dtype=np.uint8)
+    mock_cap_instance.read.side_effect = [(True, a), (True, b), (True, a)]
+
+    sampler = AdaptiveSampler(min_interval=0.1, max_interval=1000, change_threshold=5)
+    stamp = MagicMock(strftime=MagicMock(return_value="20260101_000000"))
+    with patch('time.time', side_effect=[0, 0.5, 1.0]), patch('get_data.datetime') as mock_dt:
+        mock_dt.now.return_value = stamp
+        extract_frames_live("http://dummy.stream", limit=3, interval=5, output_dir=str(tmp_path), sampler=sampler)
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "torikamera_20260101_000000_live.jpg",
+        "torikamera_20260101_000000_live_1.jpg",
+        "torikamera_20260101_000000_live_2.jpg",
+    ]
@@ -0,0 +1,121 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+import pytest
+import prelabel
+from prelabel import frame_uncertainty, load_manifest, write_labels
+
+# --- Fixtures ---
+@pytest.fixture
+def frames_dir(tmp_path):
+    for i in range(3):
+        (tmp_path / f"f{i}.jpg").write_bytes(bytes([i]) * 100)
+    (tmp_path / "model.pt").write_bytes(b"weights-v1")
+    return tmp_path
+
+def fake_run_pool(calls):
+    """
+    Stands in for the process pool: every image gets one bus box whose
+    confidence depends on the file name, mapped through the bus class map.
+    """
+    def run(paths, specs, conf, batch_size, workers, on_batch):
+        calls.append(list(paths))
+        bus = specs[0][1]["bus"]
+        preds = []
+        for p in paths:
+            c = {"f0.jpg": 0.9, "f1.jpg": 0.5, "f2.jpg": 0.2}.get(os.path.basename(p), 0.9)
+            preds.append({"path": p, "boxes": [[bus, c, 0.5, 0.5, 0.1, 0.1]], "latency_ms": 1.0})
+        on_batch(preds)
+    return run
+
+def run(frames_dir, calls, **kwargs):
+    with patch.object(prelabel, "run_pool", fake_run_pool(calls)):
+        return prelabel.prelabel(str(frames_dir), bus_model=str(frames_dir / "model.pt"), **kwargs)
+
+# --- Unit Tests ---
+
+def test_frame_uncertainty():
+    assert frame_uncertainty([]) == 0.0
+    assert frame_uncertainty([[0, 0.5, 0, 0, 0, 0]]) == 1.0
+    assert frame_uncertainty([[0, 0.95, 0, 0, 0, 0], [0, 0.4, 0, 0, 0, 0]]) == pytest.approx(0.8)
+
+def test_write_labels_applies_class_thresholds(tmp_path):
+    path = tmp_path / "x.txt"
+    boxes = [[0, 0.45, 0.5, 0.5, 0.1, 0.1], [0, 0.30, 0.2, 0.2, 0.1, 0.1], [1, 0.36, 0.1, 0.1, 0.05, 0.05]]
+    assert write_labels(str(path), boxes, {0: 0.40, 1: 0.35}) == 2
+    assert path.read_text().splitlines()[0] == "0 0.500000 0.500000 0.100000 0.100000"
+
+# --- Resume / Ranking Tests ---
+
+def test_writes_labels_and_ranks_by_uncertainty(frames_dir):
+    calls = []
+    manifest = run(frames_dir, calls)
+    assert (frames_dir / "f0.txt").read_text().startswith("0 ")
+    # 0.2 is under the bus threshold -> empty label file (background)
+    assert (frames_dir / "f2.txt").read_text() == ""
+    ranking = (frames_dir / prelabel.RANKING_NAME).read_text().splitlines()
+    assert ranking[0].endswith("f1.jpg")
+    assert set(manifest["files"]) == {"f0.jpg", "f1.jpg", "f2.jpg"}
+
+def test_rerun_only_processes_new_or_changed(frames_dir):
+    calls = []
+    run(frames_dir, calls)
+    run(frames_dir, calls)
+    assert len(calls) == 1  # Second run had nothing to do
+
+    (frames_dir / "f1.jpg").write_bytes(b"changed")
+    (frames_dir / "f3.jpg").write_bytes(b"new")
+    run(frames_dir, calls)
+    assert sorted(os.path.basename(p) for p in calls[-1]) == ["f1.jpg", "f3.jpg"]
+
+def test_new_model_relabels_everything(frames_dir):
+    calls = []
+    run(frames_dir, calls)
+    (frames_dir / "model.pt").write_bytes(b"weights-v2")
+    run(frames_dir, calls)
+    assert len(calls[-1]) == 3
+
+def test_hand_edited_labels_are_kept(frames_dir):
+    calls = []
+    run(frames_dir, calls)
+    (frames_dir / "f0.txt").write_text("0 0.1 0.1 0.1 0.1\n")
+    (frames_dir / "model.pt").write_bytes(b"weights-v2")
+    run(frames_dir, calls)
+    assert "f0.jpg" not in [os.path.basename(p) for p in calls[-1]]
+    assert (frames_dir / "f0.txt").read_text() == "0 0.1 0.1 0.1 0.1\n"
+    assert load_manifest(str(frames_dir))["files"]["f0.jpg"]["boxes"] == 1
+
+def test_missing_weights_fail_with_clear_message(frames_dir):
+    with pytest.raises(FileNotFoundError, match="Model weights not found"):
+        prelabel.prelabel(str(frames_dir), bus_model=str(frames_dir / "missing.pt"))
+
+def test_missing_local_weights_are_not_downloaded(frames_dir):
+    # Only bare names like yolov8n.pt may hit the network
+    downloads = MagicMock()
+    with patch.dict(sys.modules, {"ultralytics": MagicMock(), "ultralytics.utils": MagicMock(),
+                                  "ultralytics.utils.downloads": downloads}):
+        with pytest.raises(FileNotFoundError, match="Model weights not found"):
+            prelabel.resolve_weights("models/best.pt")
+    downloads.attempt_download_asset.assert_not_called()
+
+def test_deleted_frames_leave_manifest_and_ranking(frames_dir):
+    calls = []
+    run(frames_dir, calls)
+    (frames_dir / "f1.jpg").unlink()
+    run(frames_dir, calls)
+    assert "f1.jpg" not in load_manifest(str(frames_dir))["files"]
+    assert "f1.jpg" not in (frames_dir / prelabel.RANKING_NAME).read_text()
+
+def test_class_ids_come_from_data_yaml(frames_dir):
+    data = frames_dir / "data.yaml"
+    data.write_text("nc: 2\nnames: ['Person', 'Bus']\n")
+    calls = []
+    run(frames_dir, calls, data_yaml=str(data))
+    assert (frames_dir / "f0.txt").read_text().startswith("1 ")
+
+def test_person_model_refused_when_dataset_has_no_person(frames_dir):
+    data = frames_dir / "data.yaml"
+    data.write_text("nc: 1\nnames: ['Bus']\n")
+    with pytest.raises(ValueError, match="'person' is not in"):
+        run(frames_dir, [], data_yaml=str(data), person_model=str(frames_dir / "model.pt"))
+    assert not (frames_dir / "f0.txt").exists()
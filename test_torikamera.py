@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from torikamera import StartupTimer
+
+HEAVY_MODULES = ("cv2", "yt_dlp", "requests", "playwright", "ultralytics", "torch")
+
+# --- Unit Tests ---
+
+def test_entry_points_do_not_import_heavy_modules():
+    # Fresh interpreter, so modules imported by other tests don't leak in
+    code = (
+        "import sys, torikamera, get_data; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert out.stdout.strip() == ""
+
+def test_startup_timer_records_phases(capsys):
+    timer = StartupTimer()
+    assert timer.timed("add", lambda a, b: a + b, 1, 2) == 3
+    timer.mark("first detection")
+    timer.report()
+    names = [p[0] for p in timer.phases]
+    assert names == ["add", "first detection"]
+    out = capsys.readouterr().out
+    assert "add" in out and "first detection" in out
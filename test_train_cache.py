@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+from train_cache import TrainCache, build_cache, letterbox, letterbox_labels, load_manifest
+
+# --- Fixtures ---
+@pytest.fixture
+def split_dir(tmp_path):
+    images = tmp_path / "train" / "images"
+    labels = tmp_path / "train" / "labels"
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    for i in range(3):
+        img = np.full((90, 160, 3), 40 * (i + 1), dtype=np.uint8)
+        cv2.imwrite(str(images / f"f{i}.png"), img)
+        (labels / f"f{i}.txt").write_text("0 0.5 0.5 0.25 0.5\n")
+    return tmp_path / "train"
+
+# --- Unit Tests ---
+
+def test_letterbox_keeps_aspect_and_pads():
+    img = np.zeros((90, 160, 3), dtype=np.uint8)
+    canvas, shape0, shape, pad = letterbox(img, 64)
+    assert canvas.shape == (64, 64, 3)
+    assert shape0 == (90, 160)
+    assert shape == (36, 64)
+    assert pad == (14, 0)
+    # Padding rows keep the pad colour, content rows keep the image
+    assert canvas[0, 0, 0] == 114
+    assert canvas[14, 0, 0] == 0
+
+def test_letterbox_labels_maps_into_canvas():
+    labels = np.array([[0, 0.5, 0.5, 1.0, 1.0]], dtype=np.float32)
+    out = letterbox_labels(labels, shape=(36, 64), pad=(14, 0), size=64)
+    np.testing.assert_allclose(out[0], [0, 0.5, 0.5, 1.0, 36 / 64], rtol=1e-6)
+
+def test_build_and_read_cache(split_dir, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    build_cache(str(split_dir / "images"), cache_dir, imgsz=64, workers=2)
+
+    cache = TrainCache(cache_dir)
+    assert len(cache) == 3
+    assert cache.images.shape == (3, 64, 64, 3)
+    row = cache.row(str(split_dir / "images" / "f1.png"))
+    assert row == 1
+    assert cache.image(row, crop=True).shape == (36, 64, 3)
+    assert len(cache.image_labels(row)) == 1
+
+def test_incremental_rebuild_only_decodes_changed(split_dir, tmp_path, capsys):
+    cache_dir = str(tmp_path / "cache")
+    images = split_dir / "images"
+    build_cache(str(images), cache_dir, imgsz=64, workers=2)
+    first = load_manifest(cache_dir)
+
+    # Change one image, add one new
+    cv2.imwrite(str(images / "f1.png"), np.full((90, 160, 3), 7, dtype=np.uint8))
+    cv2.imwrite(str(images / "f3.png"), np.full((90, 160, 3), 9, dtype=np.uint8))
+    capsys.readouterr()
+    build_cache(str(images), cache_dir, imgsz=64, workers=2)
+    assert "(2 reused, 2 decoded, 0 removed" in capsys.readouterr().out
+
+    second = load_manifest(cache_dir)
+    assert second["entries"][0] == first["entries"][0]
+    assert second["entries"][1]["sha256"] != first["entries"][1]["sha256"]
+    cache = TrainCache(cache_dir)
+    assert cache.image(1, crop=True)[0, 0, 0] == 7
+    assert cache.image(3, crop=True)[0, 0, 0] == 9
+    # The new frame has no label file -> background image
+    assert len(cache.image_labels(3)) == 0
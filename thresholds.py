@@ -0,0 +1,5 @@
+# Detection confidence thresholds shared by the live detector (torikamera.py)
+# and the pre-labeler (prelabel.py). Same values as realTest.py / testNoYolo.py.
+
+BUS_CONF = 0.40
+PERSON_CONF = 0.35
@@ -0,0 +1,278 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from thresholds import BUS_CONF, PERSON_CONF
+
+# Single entry point:
+#
+#   python torikamera.py capture-live --limit 100 --interval 5
+#   python torikamera.py capture-history 6.0 12.0 --limit 10
+#   python torikamera.py detect
+#   python torikamera.py benchmark
+#
+# Only stdlib and thresholds.py are imported up here. cv2 / ultralytics /
+# yt-dlp / playwright are imported inside the subcommand that needs them, so
+# e.g. capture-history never loads torch and --help is instant.
+
+DEFAULT_URL = "https://torilive.fi/"
+BUS_MODEL = "models/best.pt"
+PERSON_MODEL = "yolov8n.pt"
+
+
+class StartupTimer:
+    """
+    Records named phases relative to process start. Phases may overlap
+    (stream opening runs in parallel with model loading).
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = []
+
+    def timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.phases.append((name, start - self.t0, time.perf_counter() - self.t0))
+
+    def mark(self, name):
+        now = time.perf_counter() - self.t0
+        self.phases.append((name, now, now))
+
+    def report(self):
+        print("Startup timing:")
+        for name, start, end in sorted(self.phases, key=lambda p: p[1]):
+            if end > start:
+                print(f"  {name:<22} {start * 1000:8.0f} -> {end * 1000:8.0f} ms  ({(end - start) * 1000:.0f} ms)")
+            else:
+                print(f"  {name:<22} {start * 1000:8.0f} ms")
+
+
+def resolve_stream(url):
+    from get_data import get_stream_url
+    return get_stream_url(url)
+
+
+def open_stream(url):
+    """
+    Resolves the HLS URL and opens it with OpenCV. Returns the capture or None.
+    """
+    import cv2
+
+    stream_url, _ = resolve_stream(url)
+    if not stream_url:
+        return None
+    cap = cv2.VideoCapture(stream_url)
+    if not cap.isOpened():
+        print("Error: Could not open video stream.", file=sys.stderr)
+        return None
+    return cap
+
+
+def load_models(bus_path, person_path):
+    from ultralytics import YOLO
+
+    models = [(YOLO(bus_path), "bus", BUS_CONF)]
+    if person_path:
+        models.append((YOLO(person_path), "person", PERSON_CONF))
+    return models
+
+
+def warm_up(models, shape=(1080, 1920, 3)):
+    """
+    One inference per model on a black Full-HD frame. The first call builds
+    and tunes the graph, so without this the first real frame pays for it.
+    """
+    import numpy as np
+
+    dummy = np.zeros(shape, dtype=np.uint8)
+    for model, _, conf in models:
+        model(dummy, conf=conf, verbose=False)
+
+
+def detect_frame(models, frame):
+    """
+    Runs every model on a frame. Returns ({label: count}, [results]).
+    """
+    counts = {}
+    results = []
+    for model, label, conf in models:
+        r = model(frame, conf=conf, verbose=False)[0]
+        counts[label] = sum(1 for box in r.boxes if model.names[int(box.cls[0])].lower() == label)
+        results.append(r)
+    return counts, results
+
+
+def cmd_capture_live(args):
+    from frame_archive import FrameArchiveWriter
+    from get_data import extract_frames_live, sampler_from_args
+
+    timer = StartupTimer()
+    stream_url, _ = timer.timed("resolve stream", resolve_stream, args.url)
+    if not stream_url:
+        sys.exit(1)
+    timer.report()
+    os.makedirs(args.output, exist_ok=True)
+    archive = FrameArchiveWriter(args.archive) if args.archive else None
+    try:
+        extract_frames_live(stream_url, args.limit, args.interval, args.output, archive=archive,
+                            sampler=sampler_from_args(args))
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def cmd_capture_history(args):
+    from frame_archive import FrameArchiveWriter
+    from get_data import extract_frames_history
+
+    timer = StartupTimer()
+    _, youtube_url = timer.timed("resolve stream", resolve_stream, args.url)
+    if not youtube_url:
+        sys.exit(1)
+    timer.report()
+    os.makedirs(args.output, exist_ok=True)
+    archive = FrameArchiveWriter(args.archive) if args.archive else None
+    try:
+        extract_frames_history(youtube_url, args.hours, args.limit, None, args.output, archive=archive)
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def cmd_detect(args):
+    timer = StartupTimer()
+
+    # Stream resolving/opening is network-bound, model loading is CPU-bound:
+    # run them side by side instead of one after the other
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        stream = pool.submit(timer.timed, "open stream", open_stream, args.url)
+        models = timer.timed("load models", load_models, args.model, args.person_model)
+        if not args.no_warmup:
+            timer.timed("warm-up", warm_up, models)
+        cap = stream.result()
+    if cap is None:
+        timer.report()
+        sys.exit(1)
+
+    import cv2
+
+    last_bus = False
+    first = True
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                continue
+
+            counts, results = detect_frame(models, frame)
+            if first:
+                timer.mark("first detection")
+                timer.report()
+                first = False
+
+            bus_detected = counts.get("bus", 0) > 0
+            print(f"Ihmisiä: {counts.get('person', 0)} | Bussi: {'KYLLÄ' if bus_detected else 'ei'}")
+            if bus_detected and not last_bus:
+                print("🚌 UUSI BUSSI TULI KUVAAN")
+            last_bus = bus_detected
+
+            if args.no_show:
+                continue
+            annotated = frame
+            for r in results:
+                annotated = r.plot(img=annotated)
+            cv2.imshow("Torikamera YOLO", annotated)
+            if cv2.waitKey(1) == 27:
+                break
+    except KeyboardInterrupt:
+        print("\nStopping detection...")
+    finally:
+        cap.release()
+        if not args.no_show:
+            cv2.destroyAllWindows()
+
+
+def cmd_benchmark(args):
+    timer = StartupTimer()
+    timer.timed("import cv2", __import__, "cv2")
+    timer.timed("import ultralytics", __import__, "ultralytics")
+    models = timer.timed("load models", load_models, args.model, args.person_model)
+
+    import cv2
+    import numpy as np
+
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            print(f"Could not read {args.image}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    if not args.no_warmup:
+        timer.timed("warm-up", warm_up, models, frame.shape)
+    timer.timed("first detection", detect_frame, models, frame)
+    timer.report()
+
+    times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        detect_frame(models, frame)
+        times.append((time.perf_counter() - start) * 1000)
+    times = np.array(times)
+    print(f"Steady state over {args.runs} frames ({len(models)} model(s)): "
+          f"mean {times.mean():.1f} ms | p50 {np.percentile(times, 50):.1f} ms | "
+          f"p95 {np.percentile(times, 95):.1f} ms | {1000 / times.mean():.1f} FPS")
+
+
+def main():
+    from get_data import add_adaptive_args
+
+    parser = argparse.ArgumentParser(description="Torikamera: capture, detect, benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_capture_args(p):
+        p.add_argument("--url", default=DEFAULT_URL, help="URL of the stream source")
+        p.add_argument("--limit", type=int, default=5, help="Number of frames to capture")
+        p.add_argument("--output", default="data/raw", help="Directory to save frames")
+        p.add_argument("--archive", help="Append frames to a sharded archive directory instead of loose JPEGs")
+
+    def add_model_args(p):
+        p.add_argument("--model", default=BUS_MODEL, help="Bus model")
+        p.add_argument("--person-model", default=PERSON_MODEL, help="Person model ('' to disable)")
+        p.add_argument("--no-warmup", action="store_true", help="Skip the dummy-frame warm-up pass")
+
+    p_live = sub.add_parser("capture-live", help="Capture frames from the live stream")
+    add_capture_args(p_live)
+    p_live.add_argument("--interval", type=int, default=5, help="Seconds between captures")
+    add_adaptive_args(p_live)
+    p_live.set_defaults(func=cmd_capture_live)
+
+    p_hist = sub.add_parser("capture-history", help="Capture frames from the past via headless browser")
+    p_hist.add_argument("hours", type=float, nargs="+", help="Hour offsets to scrape from the past (e.g. 0.5 2 12)")
+    add_capture_args(p_hist)
+    p_hist.set_defaults(func=cmd_capture_history)
+
+    p_detect = sub.add_parser("detect", help="Run bus/person detection on the live stream")
+    p_detect.add_argument("--url", default=DEFAULT_URL, help="URL of the stream source")
+    add_model_args(p_detect)
+    p_detect.add_argument("--no-show", action="store_true", help="Print counts only, no window")
+    p_detect.set_defaults(func=cmd_detect)
+
+    p_bench = sub.add_parser("benchmark", help="Measure startup phases and per-frame latency")
+    add_model_args(p_bench)
+    p_bench.add_argument("--image", help="Frame to benchmark on (default: black Full-HD frame)")
+    p_bench.add_argument("--runs", type=int, default=50, help="Timed inference runs")
+    p_bench.set_defaults(func=cmd_benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
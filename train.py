@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+
+import cv2
+import yaml
+from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+
+from train_cache import TrainCache, build_cache, cache_dir_for, split_image_dirs
+
+# Training hyperparameters taken over from training/args.yaml. Run-specific
+# keys (save_dir, mode, data, cache, ...) are left out on purpose.
+TRAIN_KEYS = (
+    "epochs", "patience", "batch", "imgsz", "device", "workers", "optimizer", "seed",
+    "deterministic", "close_mosaic", "amp", "lr0", "lrf", "momentum", "weight_decay",
+    "warmup_epochs", "warmup_momentum", "warmup_bias_lr", "box", "cls", "dfl",
+    "hsv_h", "hsv_s", "hsv_v", "degrees", "translate", "scale", "shear", "perspective",
+    "flipud", "fliplr", "mosaic", "mixup",
+)
+
+
+class CachedYOLODataset(YOLODataset):
+    """
+    YOLODataset that serves images from the memory-mapped training cache
+    instead of decoding and resizing the JPEGs every epoch. Images missing
+    from the cache (or changed on disk) fall back to the normal loader.
+    """
+
+    def __init__(self, *args, cache_dir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.train_cache = None
+        if cache_dir and os.path.exists(cache_dir):
+            cache = TrainCache(cache_dir)
+            if cache.imgsz == self.imgsz:
+                self.train_cache = cache
+                hits = sum(cache.row(f) is not None for f in self.im_files)
+                print(f"{self.prefix}Using training cache {cache_dir} ({hits}/{len(self.im_files)} images cached)")
+            else:
+                print(f"{self.prefix}Ignoring training cache {cache_dir}: built for imgsz={cache.imgsz}, training uses {self.imgsz}")
+
+    def load_image(self, i, rect_mode=True):
+        row = self.train_cache.row(self.im_files[i]) if self.train_cache else None
+        if row is None:
+            return super().load_image(i, rect_mode)
+
+        # Cached canvas already has the long side at imgsz, same as load_image(rect_mode=True)
+        im = self.train_cache.image(row, crop=True)
+        h0, w0 = self.train_cache.entries[row]["shape0"]
+        if not rect_mode:
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        # Same bookkeeping as BaseDataset.load_image so mosaic keeps working
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+
+        return im, (h0, w0), im.shape[:2]
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """
+    DetectionTrainer that builds CachedYOLODataset instead of YOLODataset.
+    """
+
+    cache_root = "data/cache"
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        model = getattr(self.model, "module", self.model)
+        gs = max(int(model.stride.max() if model else 0), 32)
+        cfg = self.args
+        return CachedYOLODataset(
+            img_path=img_path,
+            imgsz=cfg.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=cfg,
+            rect=cfg.rect or mode == "val",
+            cache=None,
+            single_cls=cfg.single_cls or False,
+            stride=gs,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=colorstr(f"{mode}: "),
+            task=cfg.task,
+            classes=cfg.classes,
+            data=self.data,
+            fraction=cfg.fraction if mode == "train" else 1.0,
+            cache_dir=cache_dir_for(img_path, self.cache_root),
+        )
+
+
+def load_train_args(path):
+    with open(path, "r", encoding="utf-8") as f:
+        saved = yaml.safe_load(f) or {}
+    return {k: saved[k] for k in TRAIN_KEYS if k in saved}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the bus detector from the preprocessed cache")
+    parser.add_argument("--dataset", default="data/labeled/85-train-15-validate-0-test", help="YOLO dataset directory (with data.yaml)")
+    parser.add_argument("--args", default="training/args.yaml", help="Hyperparameters of a previous run to reuse")
+    parser.add_argument("--model", default="yolov8n.pt", help="Starting weights")
+    parser.add_argument("--cache-root", default="data/cache", help="Training cache location")
+    parser.add_argument("--epochs", type=int, help="Override epochs")
+    parser.add_argument("--workers", type=int, help="Override dataloader workers")
+    parser.add_argument("--no-cache", action="store_true", help="Train with the plain ultralytics loader")
+    args = parser.parse_args()
+
+    data_yaml = os.path.join(args.dataset, "data.yaml")
+    if not os.path.exists(data_yaml):
+        print(f"No data.yaml in {args.dataset}", file=sys.stderr)
+        sys.exit(1)
+
+    train_args = load_train_args(args.args) if os.path.exists(args.args) else {}
+    if args.epochs is not None:
+        train_args["epochs"] = args.epochs
+    if args.workers is not None:
+        train_args["workers"] = args.workers
+    imgsz = train_args.get("imgsz", 640)
+
+    model = YOLO(args.model)
+    if args.no_cache:
+        model.train(data=data_yaml, **train_args)
+        return
+
+    # Incremental: only new or changed frames get decoded
+    for images_dir in split_image_dirs(args.dataset):
+        build_cache(images_dir, cache_dir_for(images_dir, args.cache_root), imgsz)
+
+    CachedDetectionTrainer.cache_root = args.cache_root
+    model.train(data=data_yaml, trainer=CachedDetectionTrainer, cache=False, **train_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from frame_archive import file_sha256
+
+# Preprocessed training cache.
+#
+#   data/cache/<dataset>/<split>/
+#       images.npy        <- (N, imgsz, imgsz, 3) uint8, letterboxed BGR, memory-mapped
+#       labels.npy        <- (M, 5) float32 [cls, x, y, w, h], normalized to the letterboxed canvas
+#       label_index.npy   <- (N, 2) int64 [start, count] into labels.npy
+#       manifest.json     <- imgsz + one entry per image (file, sha256, size, shapes, padding)
+#
+# Images are decoded and resized exactly once. Rebuilding only decodes files
+# that are new or whose content hash changed; everything else is copied over
+# from the previous images.npy.
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+PAD_VALUE = 114  # Same grey ultralytics uses for letterbox padding
+MANIFEST_NAME = "manifest.json"
+
+
+def letterbox(im, size):
+    """
+    Resizes so the long side is `size` (aspect kept) and pads to size x size.
+    Returns (canvas, (h0, w0), (h, w), (top, left)).
+    """
+    h0, w0 = im.shape[:2]
+    r = size / max(h0, w0)
+    h, w = min(size, round(h0 * r)), min(size, round(w0 * r))
+    if (h, w) != (h0, w0):
+        interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+        im = cv2.resize(im, (w, h), interpolation=interp)
+    top, left = (size - h) // 2, (size - w) // 2
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    canvas[top:top + h, left:left + w] = im
+    return canvas, (h0, w0), (h, w), (top, left)
+
+
+def read_yolo_labels(path):
+    """
+    Reads a YOLO .txt file into an (k, 5) float32 array. Missing file = background image.
+    """
+    if not os.path.exists(path):
+        return np.zeros((0, 5), dtype=np.float32)
+    rows = []
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 5:
+                rows.append([float(x) for x in parts[:5]])
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def letterbox_labels(labels, shape, pad, size):
+    """
+    Maps labels normalized to the original image onto the letterboxed canvas.
+    """
+    h, w = shape
+    top, left = pad
+    out = labels.copy()
+    out[:, 1] = (labels[:, 1] * w + left) / size
+    out[:, 2] = (labels[:, 2] * h + top) / size
+    out[:, 3] = labels[:, 3] * w / size
+    out[:, 4] = labels[:, 4] * h / size
+    return out
+
+
+def load_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _labels_dir_for(images_dir):
+    # YOLO layout: <split>/images/x.jpg <-> <split>/labels/x.txt
+    return os.path.join(os.path.dirname(os.path.normpath(images_dir)), "labels")
+
+
+def _decode(path, size):
+    im = cv2.imread(path)
+    if im is None:
+        raise ValueError(f"Could not read image: {path}")
+    return letterbox(im, size)
+
+
+def build_cache(images_dir, cache_dir, imgsz=640, workers=8):
+    """
+    Builds or incrementally updates the cache for one split. Returns the manifest.
+    """
+    start = time.time()
+    os.makedirs(cache_dir, exist_ok=True)
+    labels_dir = _labels_dir_for(images_dir)
+    files = sorted(n for n in os.listdir(images_dir) if n.lower().endswith(IMAGE_EXTS))
+    paths = [os.path.join(images_dir, n) for n in files]
+    if not files:
+        print(f"No images in {images_dir}, nothing to cache.")
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(file_sha256, paths))
+
+    old = load_manifest(cache_dir)
+    images_path = os.path.join(cache_dir, "images.npy")
+    old_rows = {}
+    if old and old.get("imgsz") == imgsz and os.path.exists(images_path):
+        old_rows = {e["file"]: (i, e) for i, e in enumerate(old["entries"])}
+
+    entries = [None] * len(files)
+    reuse = {}  # new row -> old row
+    todo = []
+    for i, (name, sha) in enumerate(zip(files, hashes)):
+        hit = old_rows.get(name)
+        if hit and hit[1]["sha256"] == sha:
+            reuse[i] = hit[0]
+            entries[i] = hit[1]
+        else:
+            todo.append(i)
+
+    unchanged = not todo and len(files) == len(old_rows) and all(i == j for i, j in reuse.items())
+    if not unchanged:
+        tmp_path = os.path.join(cache_dir, "images.tmp.npy")
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(files), imgsz, imgsz, 3))
+
+        if reuse:
+            old_images = np.load(images_path, mmap_mode="r")
+            for i, j in reuse.items():
+                out[i] = old_images[j]
+            del old_images
+
+        # cv2 releases the GIL while decoding/resizing, so threads scale fine here
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            decoded = pool.map(lambda i: (i, _decode(paths[i], imgsz)), todo)
+            for i, (canvas, shape0, shape, pad) in decoded:
+                out[i] = canvas
+                entries[i] = {
+                    "file": files[i],
+                    "sha256": hashes[i],
+                    "size": os.path.getsize(paths[i]),
+                    "shape0": list(shape0),
+                    "shape": list(shape),
+                    "pad": list(pad),
+                }
+
+        out.flush()
+        del out
+        # Drop the old manifest first: a crash before the new one is written
+        # then means a full rebuild instead of rows pointing at the wrong images
+        if old is not None:
+            os.remove(os.path.join(cache_dir, MANIFEST_NAME))
+        os.replace(tmp_path, images_path)
+
+    # Labels are tiny text files, so they are always repacked; this picks up
+    # relabeled boxes even when the image itself did not change
+    packed = []
+    index = np.zeros((len(files), 2), dtype=np.int64)
+    offset = 0
+    for i, name in enumerate(files):
+        e = entries[i]
+        labels = read_yolo_labels(os.path.join(labels_dir, os.path.splitext(name)[0] + ".txt"))
+        labels = letterbox_labels(labels, e["shape"], e["pad"], imgsz)
+        packed.append(labels)
+        index[i] = (offset, len(labels))
+        offset += len(labels)
+    labels_arr = np.concatenate(packed) if packed else np.zeros((0, 5), dtype=np.float32)
+    np.save(os.path.join(cache_dir, "labels.npy"), labels_arr.astype(np.float32))
+    np.save(os.path.join(cache_dir, "label_index.npy"), index)
+
+    manifest = {"imgsz": imgsz, "images_dir": os.path.abspath(images_dir), "entries": entries}
+    tmp_manifest = os.path.join(cache_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, os.path.join(cache_dir, MANIFEST_NAME))
+
+    removed = len(set(old_rows) - set(files))
+    print(f"Cache {cache_dir}: {len(files)} images "
+          f"({len(reuse)} reused, {len(todo)} decoded, {removed} removed, {offset} boxes) "
+          f"in {time.time() - start:.1f}s")
+    return manifest
+
+
+class TrainCache:
+    """
+    Read side of the cache. The image tensor is memory-mapped lazily, so the
+    object is cheap to pickle into DataLoader worker processes.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        manifest = load_manifest(cache_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No training cache in {cache_dir} (run: python train_cache.py build)")
+        self.imgsz = manifest["imgsz"]
+        self.entries = manifest["entries"]
+        self._rows = {e["file"]: i for i, e in enumerate(self.entries)}
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"))
+        self.label_index = np.load(os.path.join(cache_dir, "label_index.npy"))
+        self._images = None
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.cache_dir, "images.npy"), mmap_mode="r")
+        return self._images
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None  # Never pickle the memmap itself (it would copy the whole tensor)
+        return state
+
+    def row(self, path):
+        """
+        Row for an image path, or None if it is not cached or the file on disk
+        no longer matches (size check; the full hash check happens at build time).
+        """
+        i = self._rows.get(os.path.basename(path))
+        if i is None:
+            return None
+        try:
+            if os.path.getsize(path) != self.entries[i]["size"]:
+                return None
+        except OSError:
+            return None
+        return i
+
+    def image(self, i, crop=False):
+        """
+        Letterboxed image as a writable array. With crop=True only the resized
+        content (no padding) is returned, matching ultralytics' load_image().
+        """
+        if not crop:
+            return np.array(self.images[i])
+        e = self.entries[i]
+        (h, w), (top, left) = e["shape"], e["pad"]
+        return np.ascontiguousarray(self.images[i, top:top + h, left:left + w])
+
+    def image_labels(self, i):
+        start, count = self.label_index[i]
+        return self.labels[start:start + count]
+
+
+def cache_dir_for(images_dir, cache_root):
+    """
+    data/labeled/<dataset>/<split>/images -> <cache_root>/<dataset>/<split>
+    """
+    split_dir = os.path.dirname(os.path.normpath(os.path.abspath(images_dir)))
+    dataset = os.path.basename(os.path.dirname(split_dir))
+    return os.path.join(cache_root, dataset, os.path.basename(split_dir))
+
+
+def split_image_dirs(dataset_dir):
+    return [os.path.join(dataset_dir, split, "images")
+            for split in ("train", "valid", "test")
+            if os.path.isdir(os.path.join(dataset_dir, split, "images"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the preprocessed training cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Build/update the cache for every split of a dataset")
+    p_build.add_argument("--dataset", default="data/labeled/85-train-15-validate-0-test", help="YOLO dataset directory")
+    p_build.add_argument("--cache-root", default="data/cache", help="Where the caches are written")
+    p_build.add_argument("--imgsz", type=int, default=640, help="Training image size")
+    p_build.add_argument("--workers", type=int, default=8, help="Decode threads")
+
+    p_info = sub.add_parser("info", help="Print a cache summary")
+    p_info.add_argument("cache_dir", help="Cache directory of one split")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        dirs = split_image_dirs(args.dataset)
+        if not dirs:
+            print(f"No train/valid/test image folders in {args.dataset}", file=sys.stderr)
+            sys.exit(1)
+        for images_dir in dirs:
+            build_cache(images_dir, cache_dir_for(images_dir, args.cache_root), args.imgsz, args.workers)
+    elif args.command == "info":
+        cache = TrainCache(args.cache_dir)
+        print(f"{args.cache_dir}: {len(cache)} images @ {cache.imgsz}px, {len(cache.labels)} boxes, "
+              f"{cache.images.nbytes / (1024 * 1024):.0f} MB")
+
+
+if __name__ == "__main__":
+    main()